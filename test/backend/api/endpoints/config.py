@@ -64,3 +64,15 @@ async def get_llm_config_status():
         base_url=llm_config_store["base_url"] if configured else None,
         model=llm_config_store["model"] if configured else None
     )
+
+@router.get("/llm/providers")
+async def get_llm_provider_stats():
+    """
+    获取各 LLM 提供商的滚动延迟 (p50/p95)、错误率和健康状态（不返回 API Key）
+    """
+    from backend.service.llm_client import llm_client
+    
+    return {
+        "hedge_after": llm_client.router.hedge_after,
+        "providers": llm_client.router.stats()
+    }
@@ -0,0 +1,81 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from pathlib import Path
+from typing import List, Literal
+import re
+from backend.service.export_service import export_service
+
+router = APIRouter()
+
+class ExportJobRequest(BaseModel):
+    ids: List[str]
+
+def _check_names(ids: List[str]):
+    for filename in ids:
+        # Only bare filenames inside static/results
+        if Path(filename).name != filename:
+            raise HTTPException(status_code=400, detail=f"Invalid id: {filename}")
+
+def _stream(ids: List[str], format: str) -> StreamingResponse:
+    _check_names(ids)
+    for filename in ids:
+        required = export_service.graded_pdf(filename) if format == "zip" else export_service.graded_image(filename)
+        if not required.exists():
+            raise HTTPException(status_code=404, detail=f"Graded result not found: {filename}")
+    
+    if format == "zip":
+        body, media_type = export_service.iter_zip(ids), "application/zip"
+    else:
+        body, media_type = export_service.iter_pdf(ids), "application/pdf"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="graded.{format}"'}
+    )
+
+@router.post("/export")
+def create_export_job(request: ExportJobRequest):
+    """
+    Register the papers of a class as an export job and return its id.
+    The list travels in the body, so it is not limited by URL length.
+    """
+    if not request.ids:
+        raise HTTPException(status_code=400, detail="No ids given")
+    _check_names(request.ids)
+    job_id = export_service.create_job(request.ids)
+    return {
+        "job_id": job_id,
+        "count": len(request.ids),
+        "zip_url": f"/api/export/{job_id}?format=zip",
+        "pdf_url": f"/api/export/{job_id}?format=pdf"
+    }
+
+@router.get("/export/{job_id}")
+def export_job(job_id: str, format: Literal["zip", "pdf"] = "zip"):
+    """
+    Download every graded paper of an export job (see POST /export, or the
+    job written by `python -m backend.batch`) as one ZIP of PDFs or one
+    merged PDF, streamed from disk.
+    """
+    if not re.fullmatch(r"[0-9a-f]{32}", job_id):
+        raise HTTPException(status_code=400, detail="Invalid job id")
+    try:
+        ids = export_service.job_ids(job_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return _stream(ids, format)
+
+@router.get("/export")
+def export_graded(
+    ids: List[str] = Query(..., description="Uploaded filenames (as returned by /api/upload)"),
+    format: Literal["zip", "pdf"] = "zip"
+):
+    """
+    Download the listed graded papers as one ZIP of PDFs or one merged PDF.
+    The response is streamed from disk, so memory use does not depend on the
+    number of papers. For whole classes use an export job instead: every id
+    here is a query parameter, and long URLs are rejected by servers and proxies.
+    """
+    return _stream(ids, format)
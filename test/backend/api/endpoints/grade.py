@@ -1,25 +1,88 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from pathlib import Path
+from typing import Optional
+import asyncio
+import logging
+import os
+import threading
 from backend.service.grading_service import grading_service
+from backend.service.profiler import profiler
+from backend.service.deadline import Deadline, DeadlineExceeded, GradingCancelled
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Upper bound for a whole grading request; clients may ask for less via X-Request-Timeout
+GRADE_DEADLINE_SECONDS = float(os.getenv("GRADE_DEADLINE_SECONDS", "180"))
+# Papers graded at once per worker; each holds a decoded page, and PaddleOCR is shared
+GRADE_CONCURRENCY = max(1, int(os.getenv("GRADE_CONCURRENCY", "1")))
+_grade_slots = threading.BoundedSemaphore(GRADE_CONCURRENCY)
+
 class GradeRequest(BaseModel):
     filename: str
 
+def _grade(file_path: Path, deadline: Deadline, profiled: bool) -> dict:
+    # Runs in a worker thread; queued requests still honour cancellation and the deadline
+    while not _grade_slots.acquire(timeout=0.2):
+        deadline.check("waiting for a grading slot")
+    try:
+        # The profiler samples the thread it is entered in
+        if not profiled:
+            return grading_service.grade_exam(file_path, deadline)
+        with profiler.profile() as current:
+            result = grading_service.grade_exam(file_path, deadline)
+        result["profile_id"] = current.id
+        return result
+    finally:
+        _grade_slots.release()
+
 @router.post("/grade")
-async def grade_exam_endpoint(request: GradeRequest):
+async def grade_exam_endpoint(
+    request: GradeRequest,
+    http_request: Request,
+    profile: bool = False,
+    x_profile: Optional[str] = Header(None),
+    x_request_timeout: Optional[float] = Header(None)
+):
     """
     Trigger grading for an uploaded file.
+
+    Pass `?profile=true` or an `X-Profile: 1` header to profile this request;
+    the response then carries a `profile_id` for /api/profiles/{profile_id}.
+
+    At most GRADE_CONCURRENCY papers are graded at once per worker; others
+    wait. Grading (or waiting) is aborted when the client disconnects or the
+    deadline (GRADE_DEADLINE_SECONDS, or a shorter X-Request-Timeout) passes.
     """
     file_path = Path("backend/static/uploads") / request.filename
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
-        
+
+    seconds = GRADE_DEADLINE_SECONDS
+    if x_request_timeout and x_request_timeout > 0:
+        seconds = min(seconds, x_request_timeout)
+    deadline = Deadline(seconds)
+    profiled = profiler.should_profile(profile or x_profile in ("1", "true"))
+
+    work = asyncio.ensure_future(run_in_threadpool(_grade, file_path, deadline, profiled))
+    # Watch for the client going away while the pipeline runs in the threadpool
+    while not work.done():
+        await asyncio.wait({work}, timeout=0.5)
+        if not work.done() and await http_request.is_disconnected():
+            logger.info(f"Client disconnected, cancelling grading of {request.filename}")
+            deadline.cancel()
+            break
+
     try:
-        result = grading_service.grade_exam(file_path)
-        return result
+        return await work
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except GradingCancelled as e:
+        # Nobody is listening; 499 is the conventional "client closed request"
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+import json
+import re
+from backend.service.profiler import profiler
+
+router = APIRouter()
+
+def _check_id(profile_id: str):
+    if not re.fullmatch(r"[0-9a-f]{32}", profile_id):
+        raise HTTPException(status_code=400, detail="Invalid profile id")
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str):
+    """
+    Stage timings and sample count of a profiled grading request.
+    """
+    _check_id(profile_id)
+    path = profiler.summary_path(profile_id)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return json.loads(path.read_text(encoding="utf-8"))
+
+@router.get("/profiles/{profile_id}/folded")
+def get_profile_folded(profile_id: str):
+    """
+    Collapsed stacks ("frame;frame;frame count" per line) for flamegraph.pl or speedscope.
+    """
+    _check_id(profile_id)
+    path = profiler.folded_path(profile_id)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
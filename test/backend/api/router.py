@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from backend.api.endpoints import upload, grade, config
+from backend.api.endpoints import upload, grade, config, export, profiles
 
 api_router = APIRouter()
 
@@ -11,6 +11,8 @@ def health_check():
 api_router.include_router(upload.router, tags=["upload"])
 api_router.include_router(grade.router, tags=["grade"])
 api_router.include_router(config.router, tags=["config"])
+api_router.include_router(export.router, tags=["export"])
+api_router.include_router(profiles.router, tags=["profiles"])
 
 # Export for backwards compatibility
 router = api_router
@@ -0,0 +1,212 @@
+"""
+Offline batch grader.
+
+Grades every scan in a directory (or matching a glob) with a process pool,
+without going through HTTP. Run from the project root so it shares the
+server's static directories and environment configuration:
+
+    python -m backend.batch scans/ --workers 4
+    python -m backend.batch "scans/**/*.jpg" --manifest term1.json
+
+Progress is recorded in a JSON manifest after every file. Re-running the same
+command resumes: files already graded are skipped, failed ones are retried.
+Each scan is hard-linked (or copied) into backend/static/uploads under a
+stable id, and the graded files are registered as one export job (its id is
+stored in the manifest as "export_job"), downloadable from /api/export/<job_id>.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+UPLOAD_DIR = Path("backend/static/uploads")
+
+
+def collect_inputs(patterns: list[str]) -> list[Path]:
+    """
+    Expand directories (recursively) and glob patterns into image paths.
+    """
+    paths = set()
+    for pattern in patterns:
+        if Path(pattern).is_dir():
+            candidates = Path(pattern).rglob("*")
+        else:
+            candidates = (Path(p) for p in glob.glob(pattern, recursive=True))
+        for path in candidates:
+            if path.is_file() and path.suffix.lower() in IMAGE_SUFFIXES:
+                paths.add(path.resolve())
+    return sorted(paths)
+
+
+def upload_id(path: Path) -> str:
+    """
+    Stable upload filename for a scan, unique even when names repeat across folders.
+    """
+    digest = hashlib.sha1(str(path).encode("utf-8")).hexdigest()[:10]
+    return f"batch_{digest}_{path.name}"
+
+
+def load_manifest(path: Path) -> dict:
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "files": {}}
+
+
+def save_manifest(path: Path, manifest: dict):
+    """
+    Write atomically so a crash never leaves a truncated manifest.
+    """
+    manifest["updated"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def is_done(entry: dict | None) -> bool:
+    if not entry or entry.get("status") != "done":
+        return False
+    pdf = entry.get("outputs", {}).get("pdf_path")
+    return bool(pdf) and Path(pdf).exists()
+
+
+def _stage_upload(source: Path, file_id: str) -> Path:
+    target = UPLOAD_DIR / file_id
+    if not target.exists():
+        try:
+            # Hard link rather than symlink: StaticFiles will not serve links leaving its directory
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+    return target
+
+
+def _grade_one(source: str, file_id: str, timeout: float = 0) -> dict:
+    """
+    Runs in a worker process.
+    """
+    from backend.service.grading_service import grading_service
+    from backend.service.deadline import Deadline
+
+    started = time.time()
+    entry = {"id": file_id, "started": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    try:
+        image_path = _stage_upload(Path(source), file_id)
+        result = grading_service.grade_exam(image_path, Deadline(timeout) if timeout else None)
+        entry["status"] = "done"
+        entry["outputs"] = dict(
+            result,
+            graded_path=str((grading_service.output_dir / f"graded_{file_id}").resolve()),
+            pdf_path=str((grading_service.output_dir / f"graded_{file_id}.pdf").resolve()),
+        )
+    except Exception as e:
+        logger.exception(f"Grading failed for {source}")
+        entry["status"] = "failed"
+        entry["error"] = f"{type(e).__name__}: {e}"
+    entry["seconds"] = round(time.time() - started, 3)
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grade a directory or glob of scans offline")
+    parser.add_argument("inputs", nargs="+", help="Directories and/or glob patterns of scan images")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--manifest", type=Path, default=Path("batch_manifest.json"))
+    parser.add_argument("--timeout", type=float, default=0, help="Give up on a scan after N seconds (0 = no limit)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+
+    if not Path("backend/static").is_dir():
+        raise SystemExit("Run from the project root (the directory containing backend/)")
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+    manifest = load_manifest(args.manifest)
+    inputs = collect_inputs(args.inputs)
+    pending = [p for p in inputs if not is_done(manifest["files"].get(str(p)))]
+    logger.info(f"{len(inputs)} scans found, {len(inputs) - len(pending)} already graded, {len(pending)} to grade")
+    if not pending:
+        return
+
+    if sys.platform.startswith("linux"):
+        # Load the OCR models once here; forked workers share them copy-on-write.
+        # macOS also offers fork, but forking after native libraries start threads is unsafe there
+        import backend.service.grading_service
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+
+    start = time.time()
+    completed = failed = 0
+
+    def record(source: Path, entry: dict):
+        nonlocal completed, failed
+        completed += 1
+        if entry["status"] != "done":
+            failed += 1
+        manifest["files"][str(source)] = entry
+        save_manifest(args.manifest, manifest)
+        logger.info(f"[{completed}/{len(pending)}] {entry['status']} {source.name} ({entry.get('seconds', '-')}s)")
+
+    queue = deque(pending)
+    # Files that were running when a worker died; retried one at a time to find the culprit
+    suspects = deque()
+    while queue or suspects:
+        # A dead worker (e.g. OOM-killed) breaks the whole pool, so start a new one after each crash
+        todo, limit = (suspects, 1) if suspects else (queue, args.workers)
+        with ProcessPoolExecutor(max_workers=limit, mp_context=context) as pool:
+            # Submit only as many files as there are workers, so a crash implicates only running files
+            running = {}
+            crashed = []
+            while (todo or running) and not crashed:
+                while len(running) < limit and todo:
+                    source = todo.popleft()
+                    running[pool.submit(_grade_one, str(source), upload_id(source), args.timeout)] = source
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    source = running.pop(future)
+                    try:
+                        record(source, future.result())
+                    except BrokenProcessPool:
+                        crashed.append(source)
+                    except Exception as e:
+                        record(source, {"id": upload_id(source), "status": "failed",
+                                        "error": f"{type(e).__name__}: {e}"})
+            crashed.extend(running.values())
+
+        if len(crashed) == 1:
+            record(crashed[0], {"id": upload_id(crashed[0]), "status": "failed",
+                                "error": "Worker process died while grading this file (out of memory?)"})
+        elif crashed:
+            logger.warning(f"A worker died while grading {len(crashed)} files; retrying them one at a time")
+            suspects.extend(crashed)
+
+    elapsed = time.time() - start
+    logger.info(f"Graded {len(pending) - failed}/{len(pending)} scans in {elapsed:.1f}s "
+                f"({len(pending) / elapsed * 60:.1f} scans/min), manifest: {args.manifest}")
+
+    # One export job per manifest, refreshed on every run, covering all graded files
+    from backend.service.export_service import export_service
+    graded = [entry["id"] for entry in manifest["files"].values() if is_done(entry)]
+    if graded:
+        manifest["export_job"] = export_service.create_job(graded, manifest.get("export_job"))
+        save_manifest(args.manifest, manifest)
+        logger.info(f"Download all {len(graded)} graded papers: /api/export/{manifest['export_job']}?format=zip (or format=pdf)")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Preload-and-fork server.
+
+`uvicorn --workers N` imports the app, and with it the PaddleOCR models, once
+per worker, so memory grows by a full model copy per worker. This entry point
+imports the app (and loads the models) once in a supervisor process, then
+forks the workers, which share the read-only model pages copy-on-write:
+
+    python -m backend.serve --workers 4 --port 8000 --memory-interval 60
+
+The supervisor restarts crashed workers by forking again from the already
+loaded parent, so a restart does not reload the models. With
+--memory-interval it logs Rss / Pss / Private memory per worker from
+/proc/<pid>/smaps_rollup; Private is what each additional worker costs.
+Linux only (needs fork and /proc).
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+logger = logging.getLogger("backend.serve")
+
+
+def read_memory(pid: int) -> dict:
+    """
+    Memory of one process in MB: Rss, Pss (shared pages split between sharers)
+    and Private (pages only this process maps, i.e. its marginal cost).
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        return {}
+    private = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "private_mb": round(private / 1024, 1),
+    }
+
+
+class Supervisor:
+    def __init__(self, app, sock: socket.socket, workers: int, config_kwargs: dict, memory_interval: float):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.config_kwargs = config_kwargs
+        self.memory_interval = memory_interval
+        self.children = {}  # pid -> worker index
+        self.stopping = False
+
+    def spawn(self, index: int):
+        pid = os.fork()
+        if pid == 0:
+            # Child: let uvicorn install its own graceful-shutdown handlers
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                config = uvicorn.Config(self.app, **self.config_kwargs)
+                uvicorn.Server(config).run(sockets=[self.sock])
+            except BaseException:
+                logger.exception(f"Worker {index} crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = index
+        logger.info(f"Started worker {index} (pid {pid})")
+
+    def stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info("Shutting down workers...")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def log_memory(self):
+        parent = read_memory(os.getpid())
+        logger.info(f"Memory supervisor (pid {os.getpid()}): {parent}")
+        for pid, index in sorted(self.children.items(), key=lambda item: item[1]):
+            logger.info(f"Memory worker {index} (pid {pid}): {read_memory(pid)}")
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        for index in range(self.workers):
+            self.spawn(index)
+
+        last_report = time.monotonic()
+        restarts = []
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                time.sleep(0.5)
+                if self.memory_interval and time.monotonic() - last_report >= self.memory_interval:
+                    self.log_memory()
+                    last_report = time.monotonic()
+                continue
+
+            index = self.children.pop(pid, None)
+            if index is None or self.stopping:
+                continue
+
+            logger.warning(f"Worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+            # Back off if workers keep dying right after start
+            now = time.monotonic()
+            restarts = [t for t in restarts if now - t < 60] + [now]
+            if len(restarts) > self.workers * 5:
+                time.sleep(5)
+            self.spawn(index)
+
+        logger.info("All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API with models preloaded before forking workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--memory-interval", type=float, default=0,
+                        help="Log per-worker memory every N seconds (0 = off)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(levelname)s %(message)s")
+
+    # Loads the PaddleOCR models (via grading_service -> ocr_service) exactly once
+    from backend.main import app
+
+    # Move everything allocated so far out of the GC's reach, so collections in
+    # the workers do not write to (and un-share) the preloaded objects
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET6 if ":" in args.host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(args.backlog)
+    sock.set_inheritable(True)
+    logger.info(f"Listening on {args.host}:{args.port} with {args.workers} workers")
+
+    config_kwargs = {"host": args.host, "port": args.port, "log_level": "info"}
+    Supervisor(app, sock, args.workers, config_kwargs, args.memory_interval).run()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
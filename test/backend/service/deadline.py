@@ -0,0 +1,75 @@
+import threading
+import time
+from typing import Optional
+
+
+class GradingAborted(Exception):
+    """
+    Grading stopped before completion; the result would be thrown away.
+    """
+
+
+class GradingCancelled(GradingAborted):
+    pass
+
+
+class DeadlineExceeded(GradingAborted):
+    pass
+
+
+class Deadline:
+    """
+    End-to-end deadline plus cancellation token for one grading request.
+
+    Created per request (see api/endpoints/grade.py), checked between
+    pipeline stages and region calls, and used to cap LLM request timeouts.
+    cancel() may be called from another thread, e.g. when the client
+    disconnects.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.expires_at = time.monotonic() + seconds if seconds else None
+        self.reason = None
+        self._cancelled = threading.Event()
+
+    def cancel(self, reason: str = "client disconnected"):
+        self.reason = reason
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def aborted(self) -> bool:
+        """
+        True once cancelled or past the deadline.
+        """
+        remaining = self.remaining()
+        return self.cancelled or (remaining is not None and remaining <= 0)
+
+    def remaining(self) -> Optional[float]:
+        """
+        Seconds left, or None if there is no deadline.
+        """
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    def check(self, stage: str = ""):
+        """
+        Raise if the request was cancelled or ran out of time.
+        """
+        where = f" before {stage}" if stage else ""
+        if self._cancelled.is_set():
+            raise GradingCancelled(f"Grading cancelled{where}: {self.reason}")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(f"Grading deadline exceeded{where}")
+
+    def timeout(self, default: float) -> float:
+        """
+        `default`, shortened to the time left before the deadline.
+        """
+        self.check()
+        remaining = self.remaining()
+        return default if remaining is None else min(default, remaining)
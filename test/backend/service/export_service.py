@@ -0,0 +1,185 @@
+from pathlib import Path
+from typing import Iterator, List, Optional
+import json
+import tempfile
+import time
+import uuid
+import zipfile
+import logging
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _StreamBuffer:
+    """
+    Write-only sink for ZipFile. It has no tell()/seek(), so zipfile falls
+    back to streaming mode (sizes go in data descriptors) and whatever has
+    been written so far can be drained and yielded to the client.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ExportService:
+    """
+    Streams graded papers as one download. A class is either listed inline or
+    registered once as an export job (backend/static/exports/<job_id>.json),
+    so any number of papers can be exported by a short job id.
+    """
+
+    def __init__(self):
+        self.results_dir = Path("backend/static/results")
+        self.jobs_dir = Path("backend/static/exports")
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+
+    def create_job(self, filenames: List[str], job_id: Optional[str] = None) -> str:
+        """
+        Record the papers of an export job; an existing job_id is overwritten.
+        """
+        job_id = job_id or uuid.uuid4().hex
+        job = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "ids": list(filenames)}
+        self.job_path(job_id).write_text(json.dumps(job, ensure_ascii=False), encoding="utf-8")
+        logger.info(f"Export job {job_id}: {len(filenames)} papers")
+        return job_id
+
+    def job_path(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.json"
+
+    def job_ids(self, job_id: str) -> List[str]:
+        """
+        Filenames of an export job. Raises FileNotFoundError for unknown jobs.
+        """
+        return json.loads(self.job_path(job_id).read_text(encoding="utf-8"))["ids"]
+
+    def graded_pdf(self, filename: str) -> Path:
+        return self.results_dir / f"graded_{filename}.pdf"
+
+    def graded_image(self, filename: str) -> Path:
+        return self.results_dir / f"graded_{filename}"
+
+    def iter_zip(self, filenames: List[str]) -> Iterator[bytes]:
+        """
+        Stream a ZIP of the graded PDFs. Only one chunk is held in memory at a
+        time; PDFs are stored uncompressed since their images already are.
+        """
+        buffer = _StreamBuffer()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+            for filename in filenames:
+                path = self.graded_pdf(filename)
+                with path.open("rb") as src, archive.open(path.name, "w") as dest:
+                    while chunk := src.read(CHUNK_SIZE):
+                        dest.write(chunk)
+                        yield buffer.drain()
+        # Central directory is written on close
+        yield buffer.drain()
+
+    def iter_pdf(self, filenames: List[str]) -> Iterator[bytes]:
+        """
+        Stream one PDF with a page per graded image.
+
+        Pages are written as JPEG (DCTDecode) image XObjects straight from
+        disk, so nothing is decoded for JPEG scans; other formats are
+        re-encoded one page at a time into a spooled temp file. Object numbers
+        are fixed up front (page i uses 3+3i .. 5+3i) so the page tree can be
+        written before any page.
+        """
+        offset = 0
+        offsets = {}
+
+        def emit(obj_num, data: bytes):
+            nonlocal offset
+            if obj_num is not None:
+                offsets[obj_num] = offset
+            offset += len(data)
+            return data
+
+        yield emit(None, b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        yield emit(1, b"1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n")
+        kids = " ".join(f"{3 + 3 * i} 0 R" for i in range(len(filenames)))
+        yield emit(2, f"2 0 obj\n<< /Type /Pages /Kids [{kids}] /Count {len(filenames)} >>\nendobj\n".encode())
+
+        for i, filename in enumerate(filenames):
+            page_num, content_num, image_num = 3 + 3 * i, 4 + 3 * i, 5 + 3 * i
+            with _JPEGSource(self.graded_image(filename)) as (src, length, width, height, color_space):
+                # Same page size as _convert_to_pdf (100 dpi)
+                page_w, page_h = width * 72 / 100, height * 72 / 100
+                yield emit(page_num, (
+                    f"{page_num} 0 obj\n<< /Type /Page /Parent 2 0 R "
+                    f"/MediaBox [0 0 {page_w:.2f} {page_h:.2f}] "
+                    f"/Resources << /XObject << /Im0 {image_num} 0 R >> >> "
+                    f"/Contents {content_num} 0 R >>\nendobj\n"
+                ).encode())
+
+                content = f"q {page_w:.2f} 0 0 {page_h:.2f} 0 0 cm /Im0 Do Q".encode()
+                yield emit(content_num, (
+                    f"{content_num} 0 obj\n<< /Length {len(content)} >>\nstream\n".encode()
+                    + content + b"\nendstream\nendobj\n"
+                ))
+
+                yield emit(image_num, (
+                    f"{image_num} 0 obj\n<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                    f"/ColorSpace /{color_space} /BitsPerComponent 8 /Filter /DCTDecode "
+                    f"/Length {length} >>\nstream\n"
+                ).encode())
+                while chunk := src.read(CHUNK_SIZE):
+                    yield emit(None, chunk)
+                yield emit(None, b"\nendstream\nendobj\n")
+
+        size = 3 + 3 * len(filenames)
+        xref = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        xref += [f"{offsets[n]:010d} 00000 n \n" for n in range(1, size)]
+        xref_offset = offset
+        yield emit(None, "".join(xref).encode())
+        yield emit(None, f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+class _JPEGSource:
+    """
+    Context manager yielding (file, length, width, height, color_space) for
+    a page image as JPEG data.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        with Image.open(self.path) as img:
+            width, height = img.size
+            fmt, mode = img.format, img.mode
+            if fmt == "JPEG" and mode in ("RGB", "L"):
+                self.file = self.path.open("rb")
+                length = self.path.stat().st_size
+            else:
+                # e.g. PNG uploads: re-encode this page only
+                self.file = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+                mode = "L" if mode in ("L", "LA", "1") else "RGB"
+                img.convert(mode).save(self.file, "JPEG", quality=90)
+                length = self.file.tell()
+                self.file.seek(0)
+        color_space = "DeviceGray" if mode == "L" else "DeviceRGB"
+        return self.file, length, width, height, color_space
+
+    def __exit__(self, *exc):
+        if self.file:
+            self.file.close()
+        return False
+
+
+export_service = ExportService()
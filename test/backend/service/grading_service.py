@@ -1,9 +1,12 @@
 from pathlib import Path
+from collections import Counter
 from backend.service.ocr_service import ocr_service
 from backend.service.llm_client import llm_client
 from backend.service.image_processor import image_processor
-from PIL import Image
+from backend.service.profiler import profiler
+from backend.service.deadline import Deadline
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
@@ -11,31 +14,52 @@ class GradingService:
     def __init__(self):
         self.output_dir = Path("backend/static/results")
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Second OCR pass for answer text read below this confidence
+        self.recheck_threshold = float(os.getenv("OCR_RECHECK_THRESHOLD", "0.85"))
+        self.recheck_upscale = float(os.getenv("OCR_RECHECK_UPSCALE", "2.0"))
 
-    def grade_exam(self, image_path: Path) -> dict:
+    def grade_exam(self, image_path: Path, deadline: Deadline = None) -> dict:
         """
         Full grading pipeline with spatial segmentation:
         1. OCR 
         2. Detect question regions (by question numbers)
-        3. Grade each region with LLM
-        4. Draw one mark per region
-        5. Generate PDF
+        3. Re-OCR low-confidence text in those regions
+        4. Grade each region with LLM
+        5. Draw one mark per region
+        6. Generate PDF
+        
+        `deadline` is checked between stages and regions; GradingAborted is
+        raised once it is cancelled or exceeded.
         """
+        deadline = deadline or Deadline()
+        
         # 1. OCR
-        ocr_results = ocr_service.extract_text(image_path)
+        with profiler.stage("ocr"):
+            ocr_results = ocr_service.extract_text(image_path)
         logger.info(f"OCR found {len(ocr_results)} text regions")
         
         # 2. Detect question regions by finding question numbers
-        question_regions = self._detect_question_regions(ocr_results)
+        deadline.check("region detection")
+        with profiler.stage("detect_regions"):
+            question_regions = self._detect_question_regions(ocr_results)
         logger.info(f"Detected {len(question_regions)} question regions")
         
-        # 3. Grade each region with LLM
+        # 3. Second OCR pass, only where the first reading is uncertain
+        with profiler.stage("recheck_ocr"):
+            self._refine_low_confidence(image_path, question_regions, deadline)
+        
+        # 4. Grade each region with LLM
         marks = []
+        # How each verdict was produced: llm / fallback / mock / random / empty
+        verdict_sources = Counter()
         for i, region in enumerate(question_regions):
             logger.info(f"Grading region {i+1}: {len(region['ocr_items'])} OCR items")
             
             # Ask LLM to grade this specific region
-            is_correct = self._grade_region(region['ocr_items'])
+            deadline.check(f"grading region {i+1}")
+            with profiler.stage("llm_grade_region"):
+                is_correct, source = self._grade_region(region['ocr_items'], deadline)
+            verdict_sources[source] += 1
             
             # Calculate center of region for mark placement
             center_x = (region['x_min'] + region['x_max']) / 2
@@ -49,20 +73,28 @@ class GradingService:
         
         logger.info(f"Generated {len(marks)} marks for {len(question_regions)} regions")
             
-        # 4. Draw Marks
+        # 5. Draw Marks
         filename = image_path.name
         marked_image_path = self.output_dir / f"graded_{filename}"
-        image_processor.draw_marks(image_path, marks, marked_image_path)
+        deadline.check("drawing marks")
+        with profiler.stage("draw_marks"):
+            image_processor.draw_marks(image_path, marks, marked_image_path)
         
-        # 5. Generate PDF
+        # 6. Generate PDF
         pdf_path = self.output_dir / f"graded_{filename}.pdf"
-        self._convert_to_pdf(marked_image_path, pdf_path)
+        deadline.check("PDF generation")
+        with profiler.stage("pdf"):
+            self._convert_to_pdf(marked_image_path, pdf_path)
         
         return {
             "original_image": f"/static/uploads/{filename}",
             "graded_image": f"/static/results/graded_{filename}",
             "pdf_url": f"/static/results/graded_{filename}.pdf",
-            "details": []
+            "details": [],
+            "verdict_sources": dict(verdict_sources),
+            # True if any mark is not a verdict from the routed LLM provider;
+            # "empty" (a region with no text, e.g. a blank page) is not a failure
+            "degraded": any(source not in ("llm", "empty") for source in verdict_sources)
         }
     
     def _detect_question_regions(self, ocr_results):
@@ -178,33 +210,95 @@ class GradingService:
                     'y_max': max(y_coords),
                     'x_min': min(x_coords),
                     'x_max': max(x_coords),
-                    'ocr_items': region_items
+                    'ocr_items': region_items,
+                    # The question number itself, which is not part of the answer
+                    'marker': marker['item']
                 })
         
         return regions
     
-    def _grade_region(self, ocr_items):
+    def _refine_low_confidence(self, image_path: Path, regions, deadline: Deadline = None) -> int:
+        """
+        Re-OCR region items whose confidence is below the threshold on an
+        upscaled, contrast-enhanced crop, and keep whichever reading scores
+        higher. Question-number markers are skipped. Items are updated in
+        place. Returns the number improved.
+        """
+        low_items = [
+            item for region in regions for item in region['ocr_items']
+            if float(item.get('confidence', 1.0)) < self.recheck_threshold and item.get('box') is not None
+            and item is not region.get('marker')
+        ]
+        if not low_items:
+            return 0
+        
+        # Decode once for all crops, at the same resolution the first OCR pass used
+        image, scale = image_processor.open_for_ocr(image_path)
+        improved = 0
+        for item in low_items:
+            if deadline:
+                deadline.check("second-pass OCR")
+            enhanced = image_processor.enhance_crop(image, item['box'], scale, self.recheck_upscale)
+            if enhanced is None:
+                continue
+            crop, inner = enhanced
+            
+            # The padding can catch neighbouring text; keep only readings mostly inside the original box
+            readings = [
+                r for r in ocr_service.recognize_region(crop)
+                if self._overlap_ratio(r['box'], inner) >= 0.5
+            ]
+            if not readings:
+                continue
+            text = "".join(r['text'] for r in readings)
+            confidence = sum(float(r['confidence']) for r in readings) / len(readings)
+            
+            if text and confidence > float(item.get('confidence', 0)):
+                logger.info(f"Re-OCR: '{item.get('text', '')}' ({float(item.get('confidence', 0)):.2f}) -> '{text}' ({confidence:.2f})")
+                item['text'] = text
+                item['confidence'] = confidence
+                improved += 1
+        
+        logger.info(f"Second-pass OCR improved {improved}/{len(low_items)} low-confidence items")
+        return improved
+    
+    @staticmethod
+    def _overlap_ratio(box, rect) -> float:
+        """
+        Fraction of the polygon's bounding box that lies inside rect (x0, y0, x1, y1).
+        """
+        xs = [float(p[0]) for p in box]
+        ys = [float(p[1]) for p in box]
+        area = (max(xs) - min(xs)) * (max(ys) - min(ys))
+        if area <= 0:
+            return 0.0
+        width = min(max(xs), rect[2]) - max(min(xs), rect[0])
+        height = min(max(ys), rect[3]) - max(min(ys), rect[1])
+        return max(0.0, width) * max(0.0, height) / area
+    
+    def _grade_region(self, ocr_items, deadline: Deadline = None):
         """
         Grade a single question region using LLM.
-        Returns True if correct, False if incorrect.
+        Returns (is_correct, source), where source says where the verdict
+        came from: "llm", "fallback", "mock", "random" or "empty".
         """
         if not ocr_items:
-            return False
+            return False, "empty"
         
         # Use LLM to grade this specific region
         region_text = "\n".join([item.get('text', '') for item in ocr_items])
         
         # Simple prompt for single region grading
-        graded = llm_client.grade_text(ocr_items)
+        graded = llm_client.grade_text(ocr_items, deadline=deadline)
         
         if graded and len(graded) > 0:
             # Use majority vote if multiple results
             correct_count = sum(1 for g in graded if g.get('is_correct', False))
-            return correct_count > len(graded) / 2
+            return correct_count > len(graded) / 2, graded[0].get('source', 'llm')
         
         # Default to random if LLM fails
         import random
-        return random.choice([True, False])
+        return random.choice([True, False]), "random"
     
     def _merge_nearby_marks(self, marks, distance_threshold=100):
         """
@@ -261,9 +355,8 @@ class GradingService:
 
 
     def _convert_to_pdf(self, image_path: Path, output_path: Path):
-        image = Image.open(image_path)
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+        # Stays within the pixel budget; draw_marks already saved a reduced image for large scans
+        image, _ = image_processor.open_reduced(image_path)
         image.save(output_path, "PDF", resolution=100.0)
 
 grading_service = GradingService()
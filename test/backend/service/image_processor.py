@@ -3,12 +3,102 @@ import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 from pathlib import Path
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 class ImageProcessor:
     def __init__(self):
-        pass
+        # Max decoded pixels per request; larger scans are decoded reduced
+        # (drawing/PDF) or tiled (OCR). Only JPEG decoding stays within it
+        self.pixel_budget = int(os.getenv("IMAGE_PIXEL_BUDGET", "24000000"))
+
+    def image_size(self, image_path: str | Path) -> tuple[int, int]:
+        """
+        Read (width, height) from the file header without decoding pixels.
+        """
+        with Image.open(image_path) as img:
+            return img.size
+
+    def open_reduced(self, image_path: str | Path, max_pixels: int = None, mode: str = "RGB") -> tuple[Image.Image, float]:
+        """
+        Open an image decoded to at most `max_pixels` pixels.
+
+        JPEGs use draft mode: libjpeg scales by 1/2, 1/4 or 1/8 while
+        decoding (and decodes straight to grayscale for mode "L"), so up to
+        8x per side the full-resolution bitmap is never allocated. Other
+        formats (PNG, TIFF, ...) are decoded in full and then resized, so
+        their peak memory still grows with the scan size.
+
+        Returns:
+            (image, scale) where scale = decoded width / original width
+        """
+        if max_pixels is None:
+            max_pixels = self.pixel_budget
+
+        img = Image.open(image_path)
+        width, height = img.size
+        if img.format == "JPEG":
+            # draft() only picks a DCT scale whose output is at least the requested
+            # size, so ask for exactly the smallest 1/2^n reduction that fits
+            reduce = 1
+            while reduce < 8 and (width // reduce) * (height // reduce) > max_pixels:
+                reduce *= 2
+            img.draft(mode, (width // reduce, height // reduce))
+        if width * height > max_pixels:
+            ratio = (max_pixels / (width * height)) ** 0.5
+            target = (max(1, int(width * ratio)), max(1, int(height * ratio)))
+            if img.size[0] * img.size[1] > max_pixels:
+                if img.mode != mode:
+                    img = img.convert(mode)
+                img = img.resize(target, Image.Resampling.LANCZOS, reducing_gap=2.0)
+            logger.info(f"Reduced decode {width}x{height} -> {img.size[0]}x{img.size[1]}")
+
+        if img.mode != mode:
+            img = img.convert(mode)
+        return img, img.size[0] / width
+
+    def open_for_ocr(self, image_path: str | Path) -> tuple[Image.Image, float]:
+        """
+        Grayscale decode at the resolution OCR works on. At 1 byte/pixel this
+        allows 3x the RGB pixel budget, so scans up to that size keep their
+        full resolution.
+        """
+        return self.open_reduced(image_path, max_pixels=self.pixel_budget * 3, mode="L")
+
+    def enhance_crop(self, image: Image.Image, box: list, scale: float = 1.0, upscale: float = 2.0, pad: int = 8) -> tuple[np.ndarray, tuple] | None:
+        """
+        Cut a text box out of a page for a second OCR pass: upscale it and
+        boost local contrast (CLAHE) so faint handwriting separates from paper.
+        
+        Args:
+            image: Decoded page (possibly reduced, see open_for_ocr)
+            box: Polygon in original image coordinates
+            scale: Decoded width / original width
+            
+        Returns:
+            (crop, inner) where crop is a BGR ndarray ready for PaddleOCR and
+            inner is the un-padded box as (x0, y0, x1, y1) in crop pixels,
+            or None if the box is degenerate
+        """
+        xs = [p[0] * scale for p in box]
+        ys = [p[1] * scale for p in box]
+        left = max(0, int(min(xs)) - pad)
+        top = max(0, int(min(ys)) - pad)
+        right = min(image.size[0], int(max(xs)) + pad)
+        bottom = min(image.size[1], int(max(ys)) + pad)
+        if right - left < 2 or bottom - top < 2:
+            return None
+        
+        crop = np.asarray(image.crop((left, top, right, bottom)).convert("L"))
+        crop = cv2.resize(crop, None, fx=upscale, fy=upscale, interpolation=cv2.INTER_CUBIC)
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        crop = clahe.apply(crop)
+        inner = (
+            (min(xs) - left) * upscale, (min(ys) - top) * upscale,
+            (max(xs) - left) * upscale, (max(ys) - top) * upscale
+        )
+        return cv2.cvtColor(crop, cv2.COLOR_GRAY2BGR), inner
 
     def load_image(self, image_path: str | Path) -> np.ndarray:
         """
@@ -32,31 +122,35 @@ class ImageProcessor:
             Path to saved image
         """
         # Use Pillow for better drawing quality (anti-aliasing)
-        img = Image.open(image_path).convert("RGB")
+        # Marks are in original pixel coordinates; scale them if the scan was decoded reduced
+        img, scale = self.open_reduced(image_path)
         draw = ImageDraw.Draw(img)
         
-        logger.info(f"Drawing {len(marks)} marks on image")
+        logger.info(f"Drawing {len(marks)} marks on image (scale={scale:.3f})")
+        
+        def s(v):
+            return int(v * scale)
         
         for i, mark in enumerate(marks):
-            x, y = int(mark["x"]), int(mark["y"])
+            x, y = s(mark["x"]), s(mark["y"])
             is_correct = mark["type"] == "correct"
             # Use bright, vivid colors
             color = (0, 255, 0) if is_correct else (255, 0, 0)  # Bright green or red
             
             # Much larger size for visibility
             size = 80
-            width = 8
+            width = max(2, s(8))
             
             logger.info(f"Mark {i+1}: type={mark['type']}, position=({x}, {y})")
             
             if is_correct:
                 # Draw check mark - larger and more visible
-                points = [(x - 30, y), (x - 10, y + 30), (x + 40, y - 40)]
+                points = [(x - s(30), y), (x - s(10), y + s(30)), (x + s(40), y - s(40))]
                 draw.line(points, fill=color, width=width, joint="curve")
             else:
                 # Draw cross mark - larger
-                draw.line([(x - 30, y - 30), (x + 30, y + 30)], fill=color, width=width)
-                draw.line([(x + 30, y - 30), (x - 30, y + 30)], fill=color, width=width)
+                draw.line([(x - s(30), y - s(30)), (x + s(30), y + s(30))], fill=color, width=width)
+                draw.line([(x + s(30), y - s(30)), (x - s(30), y + s(30))], fill=color, width=width)
                 
         img.save(output_path)
         logger.info(f"Saved marked image to {output_path}")
@@ -1,8 +1,10 @@
 import os
 import json
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import requests
+from backend.service.llm_router import LLMBackend, ProviderRouter, load_backends_from_env
+from backend.service.deadline import Deadline, GradingAborted
 
 logger = logging.getLogger(__name__)
 
@@ -12,9 +14,20 @@ class LLMClient:
         self.api_key = os.getenv("LLM_API_KEY")
         self.base_url = os.getenv("LLM_BASE_URL", "https://api.openai.com/v1")
         self.model = os.getenv("LLM_MODEL", "gpt-4o")
+        self.request_timeout = float(os.getenv("LLM_TIMEOUT", "30"))
         
-        if not self.api_key:
+        # Every configured provider; LLM_API_KEY above becomes the "default" backend
+        self.router = ProviderRouter(
+            backends=load_backends_from_env(),
+            hedge_after=os.getenv("LLM_HEDGE_AFTER"),
+            max_error_rate=float(os.getenv("LLM_MAX_ERROR_RATE", "0.5")),
+            hedge_workers=int(os.getenv("LLM_HEDGE_WORKERS", "32")),
+        )
+        
+        if not self.router.backends:
             logger.warning("LLM_API_KEY not found. LLM Client will run in MOCK mode.")
+        else:
+            logger.info(f"LLM providers: {[b.name for b in self.router.backends]}")
     
     def update_config(self, api_key: str, base_url: str = None, model: str = None):
         """
@@ -25,14 +38,20 @@ class LLMClient:
             self.base_url = base_url
         if model:
             self.model = model
+        self.router.set_backend(
+            LLMBackend("default", self.api_key, self.base_url, self.model),
+            first=True
+        )
         logger.info(f"LLM config updated: base_url={self.base_url}, model={self.model}")
 
-    def grade_text(self, ocr_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def grade_text(self, ocr_results: List[Dict[str, Any]], deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
         """
         Send OCR results to LLM to identify questions, answers, and grade them.
         
         Args:
             ocr_results: List of dicts from OCR service [{'text': '...', 'box': [...]}, ...]
+            deadline: Optional request deadline; caps each HTTP timeout and
+                raises GradingAborted instead of mock-grading once it expires
             
         Returns:
             List of graded items:
@@ -42,12 +61,13 @@ class LLMClient:
                     "is_correct": True,
                     "confidence": 0.9,
                     "bbox": [[x1,y1], ...], # Bounding box to draw the mark
-                    "comment": "Correct answer"
+                    "comment": "Correct answer",
+                    "source": "llm"  # or "fallback" (backup provider) / "mock"
                 },
                 ...
             ]
         """
-        if not self.api_key:
+        if not self.router.backends:
             return self._mock_grade(ocr_results)
 
         # Construct prompt - provide full OCR data with coordinates
@@ -126,75 +146,92 @@ class LLMClient:
 
 请只返回 JSON 数组。"""
 
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+        def send(backend):
+            timeout = deadline.timeout(self.request_timeout) if deadline else self.request_timeout
+            return self._request(backend, messages, timeout)
+
         try:
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": self.model,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    "temperature": 0.1,
-                    "max_tokens": 3000
-                },
-                timeout=30
-            )
-            response.raise_for_status()
-            result = response.json()
-            
-            # Handle DeepSeek-R1 reasoning content
-            message = result["choices"][0]["message"]
-            content = message.get("content", "")
-            
-            if not content and "reasoning_content" in message:
-                logger.info("Using reasoning_content from DeepSeek-R1")
-                content = message["reasoning_content"]
-            
-            logger.info(f"LLM response length: {len(content)} chars")
-            logger.info(f"LLM response preview: {content[:300]}...")
-            
-            # Parse JSON
-            parsed_data = json.loads(content)
-            
-            # Handle different response formats
-            graded_items = []
-            if isinstance(parsed_data, dict):
-                for key in ["data", "results", "answers", "items", "questions"]:
-                    if key in parsed_data and isinstance(parsed_data[key], list):
-                        graded_items = parsed_data[key]
-                        break
-                if not graded_items:
-                    graded_items = [parsed_data]
-            elif isinstance(parsed_data, list):
-                graded_items = parsed_data
-            
-            # Convert to expected format
-            formatted_results = []
-            for item in graded_items:
-                # Handle different field names
-                text_content = item.get("answer_text") or item.get("text_content") or item.get("text", "")
-                is_correct = item.get("is_correct", False)
-                box = item.get("box", [])
-                
-                if text_content and box:
-                    formatted_results.append({
-                        "text_content": text_content,
-                        "is_correct": is_correct,
-                        "box": box
-                    })
-            
-            logger.info(f"LLM returned {len(graded_items)} answer regions")
-            return formatted_results
-            
+            graded, fell_back = self.router.execute(send, deadline=deadline)
+            for item in graded:
+                item["source"] = "fallback" if fell_back else "llm"
+            return graded
+        except GradingAborted:
+            raise
         except Exception as e:
-            logger.error(f"LLM Grading failed: {e}")
+            logger.error(f"LLM Grading failed on every provider: {e}")
             return self._mock_grade(ocr_results)
 
+    def _request(self, backend: LLMBackend, messages: List[Dict[str, str]], timeout: float) -> List[Dict[str, Any]]:
+        """
+        Send one grading request to a single backend and parse the answer regions.
+        Raises on HTTP or parse errors so the router can fall back.
+        """
+        response = requests.post(
+            f"{backend.base_url}/chat/completions",
+            headers={
+                "Authorization": f"Bearer {backend.api_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": backend.model,
+                "messages": messages,
+                "temperature": 0.1,
+                "max_tokens": 3000
+            },
+            timeout=timeout
+        )
+        response.raise_for_status()
+        result = response.json()
+        
+        # Handle DeepSeek-R1 reasoning content
+        message = result["choices"][0]["message"]
+        content = message.get("content", "")
+        
+        if not content and "reasoning_content" in message:
+            logger.info("Using reasoning_content from DeepSeek-R1")
+            content = message["reasoning_content"]
+        
+        logger.info(f"LLM response from '{backend.name}' length: {len(content)} chars")
+        logger.info(f"LLM response preview: {content[:300]}...")
+        
+        # Parse JSON
+        parsed_data = json.loads(content)
+        
+        # Handle different response formats
+        graded_items = []
+        if isinstance(parsed_data, dict):
+            for key in ["data", "results", "answers", "items", "questions"]:
+                if key in parsed_data and isinstance(parsed_data[key], list):
+                    graded_items = parsed_data[key]
+                    break
+            if not graded_items:
+                graded_items = [parsed_data]
+        elif isinstance(parsed_data, list):
+            graded_items = parsed_data
+        
+        # Convert to expected format
+        formatted_results = []
+        for item in graded_items:
+            # Handle different field names
+            text_content = item.get("answer_text") or item.get("text_content") or item.get("text", "")
+            is_correct = item.get("is_correct", False)
+            box = item.get("box", [])
+            
+            if text_content and box:
+                formatted_results.append({
+                    "text_content": text_content,
+                    "is_correct": is_correct,
+                    "box": box
+                })
+        
+        logger.info(f"LLM returned {len(graded_items)} answer regions")
+        return formatted_results
+
     def _mock_grade(self, ocr_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Mock grader for testing without API key. 
@@ -230,7 +267,8 @@ class LLMClient:
             graded.append({
                 "text_content": text,
                 "is_correct": random.choice([True, False]),
-                "box": box  # Pass the box coordinates directly
+                "box": box,  # Pass the box coordinates directly
+                "source": "mock"
             })
             
         logger.info(f"Mock grading generated {len(graded)} marks (filtered from {len(ocr_results)} total)")
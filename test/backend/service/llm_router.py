@@ -0,0 +1,308 @@
+import os
+import json
+import math
+import time
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from backend.service.deadline import Deadline, GradingAborted
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    """
+    Nearest-rank percentile, q in [0, 100]. Returns None for no samples.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class LLMBackend:
+    """
+    One OpenAI-compatible endpoint plus a rolling window of its recent
+    latencies and failures.
+    """
+
+    def __init__(self, name: str, api_key: str, base_url: str, model: str, window: int = 50):
+        self.name = name
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        # (latency_seconds, ok) for the last `window` requests
+        self._samples = deque(maxlen=window)
+        self._last_attempt = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self._samples.append((latency, ok))
+            self._last_attempt = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self._samples)
+        latencies = [latency for latency, ok in samples if ok]
+        failures = sum(1 for _, ok in samples if not ok)
+        return {
+            "name": self.name,
+            "base_url": self.base_url,
+            "model": self.model,
+            "requests": len(samples),
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "error_rate": failures / len(samples) if samples else 0.0,
+        }
+
+    def seconds_since_attempt(self) -> float:
+        with self._lock:
+            return time.monotonic() - self._last_attempt
+
+
+class ProviderRouter:
+    """
+    Routes each LLM call to the fastest healthy backend.
+
+    - Backends are ranked by rolling p50 latency; unmeasured backends go first
+      so every provider gets sampled.
+    - A backend is unhealthy once its error rate over the window exceeds
+      `max_error_rate`; it is re-probed after `probe_interval` seconds.
+    - If `hedge_after` is set and the primary has not answered by then, the
+      same request is duplicated to the next backend and the first success wins.
+    - On failure the remaining backends are tried in configured order.
+    """
+
+    def __init__(
+        self,
+        backends: Optional[List[LLMBackend]] = None,
+        hedge_after: Optional[str] = None,
+        max_error_rate: float = 0.5,
+        min_samples: int = 5,
+        probe_interval: float = 30.0,
+        hedge_workers: int = 32,
+    ):
+        self.backends: List[LLMBackend] = backends or []
+        # Either a number of seconds, or "p95" to hedge at the primary's own p95
+        self.hedge_after = hedge_after
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        # Only hedged calls run here; every other call runs on the caller's thread
+        self._executor = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix="llm-hedge")
+
+    def set_backend(self, backend: LLMBackend, first: bool = False):
+        """
+        Add a backend, replacing any existing one with the same name.
+        """
+        with self._lock:
+            others = [b for b in self.backends if b.name != backend.name]
+            self.backends = [backend] + others if first else others + [backend]
+
+    def is_healthy(self, backend: LLMBackend) -> bool:
+        stats = backend.stats()
+        if stats["requests"] < self.min_samples:
+            return True
+        if stats["error_rate"] <= self.max_error_rate:
+            return True
+        return backend.seconds_since_attempt() >= self.probe_interval
+
+    def ranked(self) -> List[LLMBackend]:
+        """
+        Fastest healthy backend first, then the other healthy backends and
+        finally the unhealthy ones, each in configured order.
+        """
+        with self._lock:
+            backends = list(self.backends)
+        healthy = [b for b in backends if self.is_healthy(b)]
+        if not healthy:
+            return backends
+
+        def latency_key(backend):
+            stats = backend.stats()
+            if stats["requests"] == 0:
+                # Never tried: go first so it gets measured
+                return -1.0
+            if stats["p50"] is None:
+                # Tried, but never succeeded
+                return float("inf")
+            return stats["p50"]
+
+        primary = min(healthy, key=latency_key)
+        return (
+            [primary]
+            + [b for b in healthy if b is not primary]
+            + [b for b in backends if b not in healthy]
+        )
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            backends = list(self.backends)
+        return [dict(b.stats(), healthy=self.is_healthy(b)) for b in backends]
+
+    def execute(self, send: Callable[[LLMBackend], Any], deadline: Optional[Deadline] = None) -> Tuple[Any, bool]:
+        """
+        Run `send(backend)` against the routed backends and return
+        (first successful result, whether it came from the fallback chain).
+        Raises the last error if every backend fails, or GradingAborted as
+        soon as `deadline` is cancelled or exceeded.
+        """
+        chain = self.ranked()
+        if not chain:
+            raise RuntimeError("No LLM backend configured")
+
+        primary = chain[0]
+        # Never hedge to a backend that is already failing
+        hedge = next((b for b in chain[1:] if self.is_healthy(b)), None)
+        hedge_delay = self._hedge_delay(primary) if hedge else None
+
+        tried = {primary.name}
+        last_error: Optional[Exception] = None
+        try:
+            if hedge_delay is None:
+                return self._attempt(primary, send, deadline), False
+            return self._hedged(primary, hedge, hedge_delay, send, tried, deadline), False
+        except GradingAborted:
+            raise
+        except Exception as e:
+            last_error = e
+
+        for backend in chain:
+            if backend.name in tried:
+                continue
+            if deadline:
+                deadline.check("LLM fallback")
+            logger.warning(f"Falling back to LLM backend '{backend.name}' after: {last_error}")
+            try:
+                return self._attempt(backend, send, deadline), True
+            except GradingAborted:
+                raise
+            except Exception as e:
+                last_error = e
+
+        raise last_error
+
+    def _hedge_delay(self, primary: LLMBackend) -> Optional[float]:
+        if not self.hedge_after:
+            return None
+        if self.hedge_after == "p95":
+            return primary.stats()["p95"]
+        try:
+            delay = float(self.hedge_after)
+        except ValueError:
+            logger.warning(f"Invalid LLM_HEDGE_AFTER value: {self.hedge_after}")
+            return None
+        return delay if delay > 0 else None
+
+    def _timed(self, backend: LLMBackend, send: Callable[[LLMBackend], Any], deadline: Optional[Deadline] = None,
+               started: Optional[threading.Event] = None) -> Any:
+        if started:
+            started.set()
+        start = time.monotonic()
+        try:
+            result = send(backend)
+        except Exception as e:
+            # A call cut short by our own deadline says nothing about the backend
+            if deadline is None or not deadline.aborted():
+                backend.record(time.monotonic() - start, ok=False)
+            logger.error(f"LLM backend '{backend.name}' failed: {e}")
+            raise
+        backend.record(time.monotonic() - start, ok=True)
+        return result
+
+    def _attempt(self, backend: LLMBackend, send, deadline: Optional[Deadline]) -> Any:
+        # Inline: send() caps its HTTP timeout to the deadline, so checking it
+        # afterwards is enough and concurrency is not limited by a shared pool
+        try:
+            result = self._timed(backend, send, deadline)
+        except Exception:
+            if deadline:
+                deadline.check("LLM response")
+            raise
+        if deadline:
+            deadline.check("LLM response")
+        return result
+
+    def _hedged(self, primary: LLMBackend, hedge: LLMBackend, delay: float, send, tried: set,
+                deadline: Optional[Deadline] = None) -> Any:
+        started = threading.Event()
+        first = self._executor.submit(self._timed, primary, send, deadline, started)
+        # Count the hedge delay from when the primary call actually starts, not
+        # from submit(), so time queued in the executor does not trigger hedges
+        while not started.wait(0.2):
+            if deadline:
+                deadline.check("LLM request")
+        done, _ = self._wait({first}, deadline, timeout=delay)
+        if done:
+            return first.result()
+
+        tried.add(hedge.name)
+        logger.info(f"LLM backend '{primary.name}' slower than {delay:.2f}s, hedging to '{hedge.name}'")
+        pending = {first, self._executor.submit(self._timed, hedge, send, deadline)}
+        last_error: Optional[Exception] = None
+        while pending:
+            done, pending = self._wait(pending, deadline)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    last_error = e
+        raise last_error
+
+    def _wait(self, pending: set, deadline: Optional[Deadline], timeout: Optional[float] = None):
+        """
+        wait(FIRST_COMPLETED) that also polls `deadline`. Abandoned calls keep
+        running in the background until their (deadline-capped) HTTP timeout.
+        """
+        if deadline is None:
+            return wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            deadline.check("LLM response")
+            step = 0.2 if end is None else max(0.0, min(0.2, end - time.monotonic()))
+            done, not_done = wait(pending, timeout=step, return_when=FIRST_COMPLETED)
+            if done or (end is not None and time.monotonic() >= end):
+                return done, not_done
+
+
+def load_backends_from_env() -> List[LLMBackend]:
+    """
+    Build backends from LLM_API_KEY/LLM_BASE_URL/LLM_MODEL (named "default")
+    and the optional LLM_PROVIDERS JSON list:
+    [{"name": "deepseek", "api_key": "...", "base_url": "...", "model": "..."}, ...]
+    """
+    window = int(os.getenv("LLM_STATS_WINDOW", "50"))
+    backends = []
+
+    api_key = os.getenv("LLM_API_KEY")
+    if api_key:
+        backends.append(LLMBackend(
+            name="default",
+            api_key=api_key,
+            base_url=os.getenv("LLM_BASE_URL", "https://api.openai.com/v1"),
+            model=os.getenv("LLM_MODEL", "gpt-4o"),
+            window=window,
+        ))
+
+    providers = os.getenv("LLM_PROVIDERS")
+    if providers:
+        try:
+            for i, item in enumerate(json.loads(providers)):
+                if not item.get("api_key"):
+                    continue
+                backends.append(LLMBackend(
+                    name=item.get("name") or f"provider{i + 1}",
+                    api_key=item["api_key"],
+                    base_url=item.get("base_url", "https://api.openai.com/v1"),
+                    model=item.get("model", "gpt-4o"),
+                    window=window,
+                ))
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.error(f"Could not parse LLM_PROVIDERS: {e}")
+
+    return backends
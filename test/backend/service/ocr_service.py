@@ -1,7 +1,10 @@
 from paddleocr import PaddleOCR
 from pathlib import Path
+from backend.service.image_processor import image_processor
+import numpy as np
 import logging
 import os
+import threading
 
 # M1/Mac optimization to prevent OpenMP crash
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
@@ -16,6 +19,11 @@ class OCRService:
         # use_angle_cls=True enables orientation classification
         # lang="ch" for Chinese support
         self.ocr = PaddleOCR(use_angle_cls=True, lang="ch")
+        # Paddle inference predictors are not thread-safe; serialize every call
+        self._ocr_lock = threading.Lock()
+        # Scans above image_processor.pixel_budget are OCRed in overlapping tiles
+        self.tile_size = int(os.getenv("OCR_TILE_SIZE", "2048"))
+        self.tile_overlap = int(os.getenv("OCR_TILE_OVERLAP", "256"))
 
     def extract_text(self, image_path: str | Path) -> list[dict]:
         """
@@ -27,10 +35,120 @@ class OCRService:
         Returns:
             List of dictionaries containing text, confidence, and bounding box.
             Format: [{'text': str, 'confidence': float, 'box': [[x,y], ...]}, ...]
+            Boxes are always in original image pixel coordinates.
         """
-        image_path_str = str(image_path)
-        result = self.ocr.ocr(image_path_str)
+        width, height = image_processor.image_size(image_path)
+        if width * height > image_processor.pixel_budget:
+            logger.info(f"Large image {width}x{height}, using tiled OCR")
+            return self._extract_tiled(image_path)
         
+        with self._ocr_lock:
+            result = self.ocr.ocr(str(image_path))
+        return self._parse_result(result)
+
+    def recognize_region(self, image: np.ndarray) -> list[dict]:
+        """
+        OCR a small, already upright crop (second pass on low-confidence text).
+        Angle classification is skipped since the crop comes from a page that
+        was already oriented. Results are ordered left to right.
+        """
+        with self._ocr_lock:
+            try:
+                result = self.ocr.ocr(image, cls=False)
+            except TypeError:
+                # PaddleOCR 3.x renamed the flag
+                result = self.ocr.ocr(image, use_textline_orientation=False)
+        
+        items = self._parse_result(result)
+        items.sort(key=lambda item: min(float(p[0]) for p in item["box"]) if len(item["box"]) else 0)
+        return items
+
+    def _extract_tiled(self, image_path: str | Path) -> list[dict]:
+        """
+        OCR a large scan tile by tile so PaddleOCR never sees the whole bitmap.
+        
+        The page is decoded once in grayscale (1 byte/pixel, so 3x the RGB
+        pixel budget) and reduced further if even that does not fit. JPEGs
+        decode straight to grayscale; other formats are decoded in full
+        first (see open_reduced). Tiles
+        overlap by `tile_overlap` so a line cut by one seam is whole in the
+        neighbouring tile; duplicates are then removed by _dedupe.
+        """
+        img, scale = image_processor.open_for_ocr(image_path)
+        width, height = img.size
+        step = max(1, self.tile_size - self.tile_overlap)
+        
+        extracted_data = []
+        for y0 in self._tile_origins(height, step):
+            for x0 in self._tile_origins(width, step):
+                x1 = min(x0 + self.tile_size, width)
+                y1 = min(y0 + self.tile_size, height)
+                # Gray -> 3 identical channels, so RGB/BGR order does not matter
+                tile = np.asarray(img.crop((x0, y0, x1, y1)).convert("RGB"))
+                with self._ocr_lock:
+                    result = self.ocr.ocr(tile)
+                items = self._parse_result(result)
+                
+                for item in items:
+                    points = [(float(p[0]), float(p[1])) for p in item["box"]]
+                    xs = [p[0] for p in points]
+                    ys = [p[1] for p in points]
+                    # Touching an inner seam means the text may be cut off here
+                    item["clipped"] = (
+                        (x0 > 0 and min(xs) <= 2) or (x1 < width and max(xs) >= x1 - x0 - 2) or
+                        (y0 > 0 and min(ys) <= 2) or (y1 < height and max(ys) >= y1 - y0 - 2)
+                    )
+                    item["box"] = [[(px + x0) / scale, (py + y0) / scale] for px, py in points]
+                    extracted_data.append(item)
+        
+        img.close()
+        deduped = self._dedupe(extracted_data)
+        logger.info(f"Tiled OCR: {len(extracted_data)} raw regions, {len(deduped)} after seam de-duplication")
+        return deduped
+
+    def _tile_origins(self, length: int, step: int) -> list[int]:
+        if length <= self.tile_size:
+            return [0]
+        origins = list(range(0, length - self.tile_size, step))
+        origins.append(length - self.tile_size)
+        return origins
+
+    @staticmethod
+    def _dedupe(items: list[dict], threshold: float = 0.5) -> list[dict]:
+        """
+        Drop boxes that mostly overlap an already kept box. Unclipped and
+        higher-confidence readings are kept first.
+        """
+        def bounds(box):
+            xs = [p[0] for p in box]
+            ys = [p[1] for p in box]
+            return min(xs), min(ys), max(xs), max(ys)
+
+        def overlap(a, b):
+            iw = min(a[2], b[2]) - max(a[0], b[0])
+            ih = min(a[3], b[3]) - max(a[1], b[1])
+            if iw <= 0 or ih <= 0:
+                return 0.0
+            smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+            return iw * ih / smaller if smaller > 0 else 0.0
+
+        ordered = sorted(items, key=lambda item: (item.get("clipped", False), -float(item["confidence"])))
+        kept = []
+        for item in ordered:
+            item.pop("clipped", None)
+            rect = bounds(item["box"])
+            if all(overlap(rect, other) <= threshold for other, _ in kept):
+                kept.append((rect, item))
+        
+        # Back to reading order (top to bottom, left to right)
+        kept.sort(key=lambda pair: (pair[0][1], pair[0][0]))
+        return [item for _, item in kept]
+
+    def _parse_result(self, result) -> list[dict]:
+        """
+        Normalise the PaddleOCR result (old list format or new OCRResult) to
+        [{'text': str, 'confidence': float, 'box': [[x,y], ...]}, ...].
+        """
         extracted_data = []
         
         # PaddleOCR result structure can vary
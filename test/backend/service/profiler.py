@@ -0,0 +1,143 @@
+from pathlib import Path
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from collections import Counter
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_NO_STAGE = nullcontext()
+
+
+class _Profile:
+    """
+    One profiled request: a sampling thread that records the request
+    thread's Python stack every `interval` seconds, plus stage timings.
+    """
+
+    def __init__(self, interval: float):
+        self.id = uuid.uuid4().hex
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.samples = Counter()
+        self.stages = []
+        self.start = time.perf_counter()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name=f"profiler-{self.id[:8]}", daemon=True)
+
+    def start_sampling(self):
+        self._sampler.start()
+
+    def stop_sampling(self):
+        self._stop.set()
+        self._sampler.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            # Folded stacks are root first
+            self.samples[";".join(reversed(stack))] += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append({
+                "name": name,
+                "start": round(start - self.start, 6),
+                "seconds": round(time.perf_counter() - start, 6)
+            })
+
+
+class RequestProfiler:
+    """
+    Opt-in profiling of the grading pipeline.
+
+    Disabled by default: unless a request asks for it (or is picked by
+    PROFILE_SAMPLE_RATE), stage() returns a shared no-op context and no
+    sampling thread runs. Profiles are written to backend/static/profiles as
+    <id>.json (stage timings) and <id>.folded (collapsed stacks for
+    flamegraph.pl / speedscope).
+    """
+
+    def __init__(self):
+        self.output_dir = Path("backend/static/profiles")
+        self.sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.interval = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+        self._current: ContextVar[_Profile | None] = ContextVar("request_profile", default=None)
+
+    def should_profile(self, requested: bool = False) -> bool:
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def stage(self, name: str):
+        """
+        Time a pipeline stage of the current profile, if any.
+        """
+        profile = self._current.get()
+        if profile is None:
+            return _NO_STAGE
+        return profile.stage(name)
+
+    @contextmanager
+    def profile(self):
+        """
+        Profile the code in the with-block, which must run in this thread.
+        Yields the profile so the caller can report its id.
+        """
+        profile = _Profile(self.interval)
+        token = self._current.set(profile)
+        profile.start_sampling()
+        try:
+            yield profile
+        finally:
+            profile.stop_sampling()
+            self._current.reset(token)
+            self._save(profile, time.perf_counter() - profile.start)
+
+    def _save(self, profile: _Profile, wall_seconds: float):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        totals = Counter()
+        for stage in profile.stages:
+            totals[stage["name"]] += stage["seconds"]
+
+        summary = {
+            "id": profile.id,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "wall_seconds": round(wall_seconds, 6),
+            "interval_ms": self.interval * 1000,
+            "samples": sum(profile.samples.values()),
+            "stage_totals": {name: round(seconds, 6) for name, seconds in totals.items()},
+            "stages": profile.stages,
+        }
+        (self.output_dir / f"{profile.id}.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        (self.output_dir / f"{profile.id}.folded").write_text(
+            "".join(f"{stack} {count}\n" for stack, count in profile.samples.most_common()),
+            encoding="utf-8"
+        )
+        logger.info(f"Saved profile {profile.id}: {summary['samples']} samples, stages={summary['stage_totals']}")
+
+    def summary_path(self, profile_id: str) -> Path:
+        return self.output_dir / f"{profile_id}.json"
+
+    def folded_path(self, profile_id: str) -> Path:
+        return self.output_dir / f"{profile_id}.folded"
+
+
+profiler = RequestProfiler()
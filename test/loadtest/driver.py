@@ -0,0 +1,223 @@
+"""
+Open-loop load driver for /api/upload + /api/grade.
+
+Replays a directory of sample pages at a fixed request rate and reports
+throughput, latency percentiles and errors per stage. The backend answers
+HTTP 200 even when LLM calls fail (it falls back to another provider or to
+mock verdicts), so the grade stage also reports those degraded responses:
+
+    python -m loadtest.driver --corpus samples/ --rate 2 --duration 60
+
+Requests are started on schedule regardless of how many are still in flight,
+up to --max-in-flight; beyond that they are queued until a slot frees up.
+End-to-end latency is measured from the scheduled start, so both a saturated
+server and that queueing show up as growing `end_to_end` latency instead of
+a silently lower request rate.
+"""
+import argparse
+import itertools
+import json
+import logging
+import math
+import mimetypes
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+STAGES = ["upload", "grade", "end_to_end"]
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+class Recorder:
+    """
+    Thread-safe collection of per-stage latencies and error kinds.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(Counter)
+        # Per-mark verdict sources reported by /api/grade (llm / fallback /
+        # mock / random / empty), and how many HTTP 200 responses contained
+        # a fallback/mock/random verdict
+        self.verdicts = Counter()
+        self.degraded = 0
+        self._lock = threading.Lock()
+
+    def ok(self, stage: str, seconds: float):
+        with self._lock:
+            self.latencies[stage].append(seconds)
+
+    def error(self, stage: str, kind: str):
+        with self._lock:
+            self.errors[stage][kind] += 1
+
+    def grade_result(self, result: dict):
+        with self._lock:
+            self.verdicts.update(result.get("verdict_sources", {}))
+            if result.get("degraded"):
+                self.degraded += 1
+
+    def report(self, wall_seconds: float, scheduled: int, schedule_seconds: float) -> dict:
+        """
+        `schedule_seconds` is the span the requests were scheduled over; the
+        offered rate comes from it, while throughput uses the full wall time
+        including the tail of requests still in flight after the last start.
+        """
+        with self._lock:
+            report = {
+                "wall_seconds": round(wall_seconds, 3),
+                "schedule_seconds": round(schedule_seconds, 3),
+                "scheduled": scheduled,
+                "offered_rate": round(scheduled / schedule_seconds, 3) if schedule_seconds else 0,
+                "stages": {}
+            }
+            for stage in STAGES:
+                values = self.latencies[stage]
+                errors = self.errors[stage]
+                total = len(values) + sum(errors.values())
+                report["stages"][stage] = {
+                    "ok": len(values),
+                    "errors": sum(errors.values()),
+                    "error_rate": round(sum(errors.values()) / total, 4) if total else 0,
+                    "throughput": round(len(values) / wall_seconds, 3) if wall_seconds else 0,
+                    "p50": percentile(values, 50),
+                    "p90": percentile(values, 90),
+                    "p95": percentile(values, 95),
+                    "p99": percentile(values, 99),
+                    "max": max(values) if values else None,
+                    "error_breakdown": dict(errors),
+                }
+            grade = report["stages"]["grade"]
+            grade["degraded_responses"] = self.degraded
+            grade["degraded_rate"] = round(self.degraded / grade["ok"], 4) if grade["ok"] else 0
+            grade["verdict_breakdown"] = dict(self.verdicts)
+            return report
+
+
+def error_kind(exc: Exception) -> str:
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return f"HTTP {exc.response.status_code}"
+    return type(exc).__name__
+
+
+def run_one(session: requests.Session, base_url: str, page: Path, scheduled_at: float,
+            timeout: float, recorder: Recorder):
+    """
+    Upload one page and grade it, recording each stage.
+    """
+    content_type = mimetypes.guess_type(page.name)[0] or "image/jpeg"
+
+    start = time.monotonic()
+    try:
+        with page.open("rb") as f:
+            response = session.post(f"{base_url}/api/upload",
+                                    files={"file": (page.name, f, content_type)}, timeout=timeout)
+        response.raise_for_status()
+        filename = response.json()["filename"]
+    except Exception as e:
+        recorder.error("upload", error_kind(e))
+        recorder.error("end_to_end", "upload failed")
+        return
+    recorder.ok("upload", time.monotonic() - start)
+
+    start = time.monotonic()
+    try:
+        response = session.post(f"{base_url}/api/grade", json={"filename": filename}, timeout=timeout)
+        response.raise_for_status()
+        result = response.json()
+    except Exception as e:
+        recorder.error("grade", error_kind(e))
+        recorder.error("end_to_end", "grade failed")
+        return
+    end = time.monotonic()
+    recorder.ok("grade", end - start)
+    recorder.grade_result(result)
+    recorder.ok("end_to_end", end - scheduled_at)
+
+
+def load_corpus(corpus: Path) -> list[Path]:
+    pages = sorted(p for p in corpus.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+    if not pages:
+        raise SystemExit(f"No sample pages found under {corpus}")
+    return pages
+
+
+def print_report(report: dict):
+    print(f"\nScheduled {report['scheduled']} requests over {report['schedule_seconds']}s "
+          f"(offered {report['offered_rate']} req/s), all done after {report['wall_seconds']}s\n")
+    header = f"{'stage':<11}{'ok':>6}{'err':>6}{'req/s':>8}{'p50':>8}{'p90':>8}{'p95':>8}{'p99':>8}{'max':>8}"
+    print(header)
+    print("-" * len(header))
+
+    def fmt(value):
+        return f"{value:8.2f}" if value is not None else f"{'-':>8}"
+
+    for stage, s in report["stages"].items():
+        print(f"{stage:<11}{s['ok']:>6}{s['errors']:>6}{s['throughput']:>8.2f}"
+              f"{fmt(s['p50'])}{fmt(s['p90'])}{fmt(s['p95'])}{fmt(s['p99'])}{fmt(s['max'])}")
+    grade = report["stages"]["grade"]
+    if grade["verdict_breakdown"]:
+        print("\ngrade verdicts: " + ", ".join(f"{k}={v}" for k, v in grade["verdict_breakdown"].items()))
+        print(f"degraded responses (HTTP 200 with fallback/mock/random verdicts): "
+              f"{grade['degraded_responses']} ({grade['degraded_rate']:.1%})")
+    for stage, s in report["stages"].items():
+        if s["error_breakdown"]:
+            print(f"\n{stage} errors: " + ", ".join(f"{k}={v}" for k, v in s["error_breakdown"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/upload and /api/grade")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--corpus", type=Path, required=True, help="Directory of sample page images")
+    parser.add_argument("--rate", type=float, default=1.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to keep scheduling requests")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Upper bound on concurrent requests")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request HTTP timeout in seconds")
+    parser.add_argument("--report", type=Path, help="Also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    pages = load_corpus(args.corpus)
+    base_url = args.base_url.rstrip("/")
+    total = max(1, int(args.rate * args.duration))
+    logger.info(f"Replaying {len(pages)} pages: {total} requests at {args.rate} req/s against {base_url}")
+
+    recorder = Recorder()
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.max_in_flight)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.max_in_flight) as pool:
+        for i, page in zip(range(total), itertools.cycle(pages)):
+            scheduled_at = start + i / args.rate
+            delay = scheduled_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run_one, session, base_url, page, scheduled_at, args.timeout, recorder)
+    wall = time.monotonic() - start
+
+    report = recorder.report(wall, total, total / args.rate)
+    print_report(report)
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        logger.info(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
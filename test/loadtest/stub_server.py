@@ -0,0 +1,143 @@
+"""
+Local OpenAI-compatible stub for load testing.
+
+Answers POST .../chat/completions with a canned verdict after a configurable
+delay, failing a configurable fraction of requests. Point the backend at it:
+
+    python -m loadtest.stub_server --port 9000 --latency lognormal --latency-ms 1500
+    LLM_API_KEY=stub LLM_BASE_URL=http://127.0.0.1:9000/v1 uvicorn backend.main:app
+"""
+import argparse
+import json
+import logging
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VERDICT = [
+    {"question_number": 1, "answer_text": "A", "is_correct": True,
+     "box": [[100, 200], [120, 200], [120, 220], [100, 220]]},
+    {"question_number": 2, "answer_text": "B", "is_correct": False,
+     "box": [[100, 300], [120, 300], [120, 320], [100, 320]]},
+]
+
+
+class StubConfig:
+    def __init__(self, latency: str, latency_ms: float, spread_ms: float, sigma: float,
+                 error_rate: float, error_status: int, verdict: str):
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.spread_ms = spread_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.verdict = verdict
+
+    def sample_delay(self) -> float:
+        """
+        Draw one response delay in seconds.
+        """
+        if self.latency == "uniform":
+            ms = random.uniform(self.latency_ms - self.spread_ms, self.latency_ms + self.spread_ms)
+        elif self.latency == "exponential":
+            ms = random.expovariate(1.0 / self.latency_ms) if self.latency_ms > 0 else 0
+        elif self.latency == "lognormal":
+            # latency_ms is the median; sigma controls the tail
+            ms = self.latency_ms * random.lognormvariate(0, self.sigma)
+        else:
+            ms = self.latency_ms
+        return max(0.0, ms) / 1000
+
+
+def make_handler(config: StubConfig):
+    class ChatCompletionsHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+
+            try:
+                model = json.loads(body).get("model", "stub")
+            except ValueError:
+                self._send(400, {"error": {"message": "Invalid JSON body"}})
+                return
+
+            time.sleep(config.sample_delay())
+
+            if random.random() < config.error_rate:
+                self._send(config.error_status, {"error": {"message": "Injected stub failure"}})
+                return
+
+            self._send(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": config.verdict},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            })
+
+        def _send(self, status: int, payload: dict):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return ChatCompletionsHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible /chat/completions stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "exponential", "lognormal"], default="fixed")
+    parser.add_argument("--latency-ms", type=float, default=800, help="Fixed/mean/median delay in ms")
+    parser.add_argument("--spread-ms", type=float, default=400, help="Half-width for uniform latency")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Shape for lognormal latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--verdict-file", type=Path, help="JSON file returned as the model's message content")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.verdict_file:
+        verdict = args.verdict_file.read_text(encoding="utf-8")
+        json.loads(verdict)  # fail fast on a malformed file
+    else:
+        verdict = json.dumps(DEFAULT_VERDICT, ensure_ascii=False)
+
+    config = StubConfig(args.latency, args.latency_ms, args.spread_ms, args.sigma,
+                        args.error_rate, args.error_status, verdict)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    server.daemon_threads = True
+    logger.info(f"LLM stub listening on http://{args.host}:{args.port}/v1/chat/completions "
+                f"(latency={args.latency} {args.latency_ms}ms, error_rate={args.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()